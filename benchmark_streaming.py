@@ -0,0 +1,111 @@
+import asyncio
+import argparse
+import base64
+import json
+import os
+import statistics
+import struct
+import time
+from datetime import datetime
+
+from streaming_server import StreamingServer, Message
+
+async def sse_client(port, latencies, ready):
+    """Subscribe over Server-Sent Events and record per-message latency"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    ready.release()
+
+    try:
+        while True:
+            event = await reader.readuntil(b"\n\n")
+            data = event.split(b"data: ", 1)[1]
+            payload = json.loads(data)
+            if payload.get('done'):
+                break
+            latencies.append(time.perf_counter() - payload['sent'])
+    finally:
+        writer.close()
+
+async def ws_client(port, latencies, ready):
+    """Subscribe over WebSocket and record per-message latency"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        "GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    ready.release()
+
+    try:
+        while True:
+            _, second = await reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            payload = json.loads(await reader.readexactly(length))['data']
+            if payload.get('done'):
+                break
+            latencies.append(time.perf_counter() - payload['sent'])
+    finally:
+        writer.close()
+
+async def run_benchmark(args):
+    server = StreamingServer(port=0, buffer_size=args.buffer_size)
+    await server.start()
+
+    latencies = []
+    ready = asyncio.Semaphore(0)
+    client = ws_client if args.protocol == "ws" else sse_client
+    tasks = [asyncio.ensure_future(client(server.port, latencies, ready)) for _ in range(args.clients)]
+    for _ in range(args.clients):
+        await ready.acquire()
+    # Let the server register every subscriber
+    while len(server.broadcaster.subscribers) < args.clients:
+        await asyncio.sleep(0.01)
+
+    emotions = {'angry': 0.01, 'disgust': 0.0, 'fear': 0.02, 'happy': 0.9, 'sad': 0.03, 'surprise': 0.01, 'neutral': 0.03}
+    interval = 1.0 / args.rate
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        server.broadcaster.publish(Message('emotion', {
+            'timestamp': datetime.now().isoformat(),
+            'emotions': emotions,
+            'dominant_emotion': 'happy',
+            'sent': time.perf_counter(),
+        }))
+        await asyncio.sleep(interval)
+    server.broadcaster.publish(Message('emotion', {'done': True}))
+
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=30)
+    elapsed = time.perf_counter() - start
+    dropped = args.clients * args.messages - len(latencies)
+    await server.stop()
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    def percentile(p):
+        return latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * p))]
+
+    print(f"protocol={args.protocol} clients={args.clients} messages={args.messages} rate={args.rate}/s")
+    print(f"delivered={len(latencies)} dropped={dropped} elapsed={elapsed:.2f}s")
+    print(f"latency ms: mean={statistics.mean(latencies_ms):.2f} p50={percentile(0.50):.2f} "
+          f"p95={percentile(0.95):.2f} p99={percentile(0.99):.2f} max={latencies_ms[-1]:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming server broadcast latency")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=10.0, help="Messages published per second")
+    parser.add_argument("--protocol", choices=["ws", "sse"], default="ws")
+    parser.add_argument("--buffer-size", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+if __name__ == "__main__":
+    main()
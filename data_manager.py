@@ -1,24 +1,205 @@
 import pandas as pd
+import numpy as np
 import json
 import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EMOTION_COLUMNS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Partition widths in microseconds
+SEGMENT_INTERVALS = {
+    'hourly': 3600 * 1_000_000,
+    'daily': 24 * 3600 * 1_000_000,
+}
+
 class DataManager:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", segment_interval="hourly", retention_days=None,
+                 max_total_mb=1024, compact_interval=300, compact_min_segments=32,
+                 background_compaction=True, orphan_grace_seconds=600):
+        if segment_interval not in SEGMENT_INTERVALS:
+            raise ValueError(f"segment_interval must be one of {list(SEGMENT_INTERVALS)}")
+
         self.data_dir = data_dir
         self.emotions_file = os.path.join(data_dir, "emotions.csv")
         self.session_file = os.path.join(data_dir, "session_data.json")
+        self.segments_dir = os.path.join(data_dir, "segments")
+        self.manifest_file = os.path.join(self.segments_dir, "manifest.json")
+        self.lock_file = os.path.join(self.segments_dir, "manifest.lock")
+
+        self.segment_interval = segment_interval
+        self.partition_us = SEGMENT_INTERVALS[segment_interval]
+        self.set_retention(retention_days, max_total_mb)
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.compact_interval = compact_interval
+        self.compact_min_segments = compact_min_segments
+
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._compactor_thread = None
+
         self.ensure_data_directory()
-        
+        self.manifest = self._load_manifest()
+        self._import_legacy_csv()
+        self.enforce_retention()
+
+        if background_compaction and compact_interval:
+            self.start_compactor()
+
+    def set_retention(self, retention_days=None, max_total_mb=None):
+        """Configure age and size limits; None (or 0) disables a limit"""
+        self.retention_days = retention_days or None
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024) if max_total_mb else None
+
     def ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
         os.makedirs(self.data_dir, exist_ok=True)
-        
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+    def _load_manifest(self):
+        """Load segment manifest, or start an empty one"""
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        return {'version': 1, 'legacy_imported': False, 'segments': []}
+
+    def _save_manifest(self):
+        """Atomically write the manifest to disk"""
+        tmp_path = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_file)
+
+    @contextmanager
+    def _manifest_transaction(self):
+        """Lock the manifest across threads and processes, reload it, and save it on exit
+
+        Several DataManagers (one per Streamlit session, the streaming server)
+        may share a data directory, so every change starts from the on-disk copy.
+        """
+        with self._lock:
+            with open(self.lock_file, 'a+') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                else:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    self.manifest = self._load_manifest()
+                    yield self.manifest
+                    self._save_manifest()
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+                    else:
+                        lock.seek(0)
+                        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _import_legacy_csv(self):
+        """Copy rows from the old emotions.csv into segments (once)"""
+        if self.manifest.get('legacy_imported') or not os.path.exists(self.emotions_file):
+            return
+
+        with self._manifest_transaction() as manifest:
+            # Another instance may have imported it in the meantime
+            if manifest.get('legacy_imported'):
+                return
+
+            df = pd.read_csv(self.emotions_file)
+            if not df.empty:
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+                entries = self._write_segments(df)
+                for entry in entries:
+                    entry['legacy'] = True
+                manifest['segments'].extend(entries)
+            manifest['legacy_imported'] = True
+
+    @staticmethod
+    def _to_us(value):
+        """Convert a naive timestamp to microseconds, matching stored timestamps"""
+        return int(pd.Timestamp(value).value // 1000)
+
+    def _now_us(self):
+        return self._to_us(datetime.now())
+
+    def _to_columns(self, df):
+        """Convert a record DataFrame into compact column arrays"""
+        timestamps = pd.to_datetime(df['timestamp']).values.astype('datetime64[us]').astype(np.int64)
+
+        labels, codes = np.unique(df['dominant_emotion'].astype(str).values, return_inverse=True)
+
+        columns = {
+            'timestamp': timestamps,
+            'dominant_code': codes.astype(np.uint8),
+            'dominant_labels': labels.astype(str),
+        }
+        for emotion in EMOTION_COLUMNS:
+            if emotion in df.columns:
+                columns[emotion] = df[emotion].values.astype(np.float32)
+            else:
+                columns[emotion] = np.full(len(df), np.nan, dtype=np.float32)
+        return columns
+
+    def _write_segment(self, partition, columns):
+        """Write one immutable segment file and return its manifest entry"""
+        # Unique names so writers sharing the directory never collide
+        partition_name = pd.Timestamp(partition, unit='us').strftime('%Y%m%dT%H')
+        file_name = f"{partition_name}-{uuid.uuid4().hex}.npz"
+        path = os.path.join(self.segments_dir, file_name)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_path, path)
+
+        return {
+            'file': file_name,
+            'partition': int(partition),
+            'start': int(columns['timestamp'].min()),
+            'end': int(columns['timestamp'].max()),
+            'rows': int(len(columns['timestamp'])),
+            'bytes': os.path.getsize(path),
+        }
+
+    def _write_segments(self, df):
+        """Split records by partition and write one segment per partition"""
+        columns = self._to_columns(df)
+        partitions = columns['timestamp'] // self.partition_us * self.partition_us
+
+        entries = []
+        for partition in np.unique(partitions):
+            mask = partitions == partition
+            part_columns = {
+                name: (values if name == 'dominant_labels' else values[mask])
+                for name, values in columns.items()
+            }
+            entries.append(self._write_segment(partition, part_columns))
+        return entries
+
+    def _read_segment(self, entry):
+        """Load a segment file into a DataFrame"""
+        path = os.path.join(self.segments_dir, entry['file'])
+        with np.load(path, allow_pickle=False) as data:
+            df = pd.DataFrame({'timestamp': pd.to_datetime(data['timestamp'], unit='us')})
+            for emotion in EMOTION_COLUMNS:
+                df[emotion] = data[emotion]
+            df['dominant_emotion'] = data['dominant_labels'][data['dominant_code']]
+        return df
+
     def save_emotion_data(self, emotion_data_list):
-        """Save emotion data to CSV"""
+        """Save emotion data as a new segment in its time partition"""
         if not emotion_data_list:
             return
-            
+
         # Convert to DataFrame
         records = []
         for data in emotion_data_list:
@@ -26,30 +207,216 @@ class DataManager:
             record.update(data['emotions'])
             record['dominant_emotion'] = data['dominant_emotion']
             records.append(record)
-        
+
         df = pd.DataFrame(records)
-        
-        # Append to existing file or create new
-        if os.path.exists(self.emotions_file):
-            existing_df = pd.read_csv(self.emotions_file)
-            df = pd.concat([existing_df, df], ignore_index=True)
-        
-        df.to_csv(self.emotions_file, index=False)
-    
-    def load_emotion_data(self):
-        """Load emotion data from CSV"""
-        if os.path.exists(self.emotions_file):
-            df = pd.read_csv(self.emotions_file)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            return df
-        return pd.DataFrame()
-    
+        entries = self._write_segments(df)
+        with self._manifest_transaction() as manifest:
+            manifest['segments'].extend(entries)
+
+    def load_emotion_data(self, start=None, end=None, limit=None):
+        """Load emotion data, optionally restricted to a time range or the newest `limit` rows"""
+        # Compaction in another process can delete segments between reading
+        # the manifest and the files, so retry with a fresh manifest
+        for _ in range(3):
+            try:
+                return self._load_range(start, end, limit)
+            except FileNotFoundError:
+                continue
+        return self._load_range(start, end, limit)
+
+    def _load_range(self, start, end, limit):
+        start_us = self._to_us(start) if start is not None else None
+        end_us = self._to_us(end) if end is not None else None
+
+        with self._lock:
+            self.manifest = self._load_manifest()
+            # Use the manifest to skip segments outside the range
+            entries = [
+                entry for entry in self.manifest['segments']
+                if (start_us is None or entry['end'] >= start_us)
+                and (end_us is None or entry['start'] <= end_us)
+            ]
+        entries.sort(key=lambda entry: entry['end'], reverse=True)
+
+        frames = []
+        rows = 0
+        oldest_read = None
+        for entry in entries:
+            # Stop once enough matching rows are loaded and the rest are all older
+            if limit is not None and rows >= limit and entry['end'] < oldest_read:
+                break
+            df = self._read_segment(entry)
+            if start is not None:
+                df = df[df['timestamp'] >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df['timestamp'] <= pd.Timestamp(end)]
+            frames.append(df)
+            rows += len(df)
+            oldest_read = entry['start'] if oldest_read is None else min(oldest_read, entry['start'])
+
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+        if limit is not None:
+            df = df.tail(limit).reset_index(drop=True)
+        return df
+
+    def _delete_files(self, entries):
+        """Delete segment files that are no longer in the manifest"""
+        for entry in entries:
+            try:
+                os.remove(os.path.join(self.segments_dir, entry['file']))
+            except FileNotFoundError:
+                pass
+
+    def enforce_retention(self):
+        """Delete segments older than the retention period or beyond the size budget"""
+        if not self.retention_days and not self.max_total_bytes:
+            return 0
+
+        with self._manifest_transaction() as manifest:
+            segments = sorted(manifest['segments'], key=lambda entry: entry['end'])
+            expired = []
+
+            if self.retention_days:
+                # Imported history predates the retention window by design; keep it
+                cutoff = self._now_us() - int(self.retention_days * 24 * 3600 * 1_000_000)
+                expired = [entry for entry in segments if entry['end'] < cutoff and not entry.get('legacy')]
+                segments = [entry for entry in segments if entry not in expired]
+
+            if self.max_total_bytes:
+                total = sum(entry['bytes'] for entry in segments)
+                while segments and total > self.max_total_bytes:
+                    oldest = segments.pop(0)
+                    expired.append(oldest)
+                    total -= oldest['bytes']
+
+            expired_files = {entry['file'] for entry in expired}
+            manifest['segments'] = [entry for entry in manifest['segments'] if entry['file'] not in expired_files]
+
+        self._delete_files(expired)
+        return len(expired)
+
+    def compact_segments(self):
+        """Merge small segments within each partition"""
+        current_partition = self._now_us() // self.partition_us * self.partition_us
+
+        with self._lock:
+            self.manifest = self._load_manifest()
+            by_partition = {}
+            for entry in self.manifest['segments']:
+                by_partition.setdefault(entry['partition'], []).append(entry)
+
+        merged = 0
+        for partition, entries in by_partition.items():
+            if partition >= current_partition:
+                # The open partition is still being appended to: only merge
+                # the new small segments, never rewrite earlier merge results
+                entries = [entry for entry in entries if not entry.get('compacted')]
+                if len(entries) < self.compact_min_segments:
+                    continue
+            elif len(entries) < 2:
+                continue
+
+            # Segment files are immutable, so merging can happen outside the lock
+            try:
+                df = pd.concat([self._read_segment(entry) for entry in entries], ignore_index=True)
+            except FileNotFoundError:
+                continue
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+            new_entry = self._write_segment(partition, self._to_columns(df))
+            new_entry['compacted'] = True
+            if all(entry.get('legacy') for entry in entries):
+                new_entry['legacy'] = True
+
+            with self._manifest_transaction() as manifest:
+                current_files = {entry['file'] for entry in manifest['segments']}
+                inputs_present = all(entry['file'] in current_files for entry in entries)
+                if inputs_present:
+                    merged_files = {entry['file'] for entry in entries}
+                    manifest['segments'] = [
+                        entry for entry in manifest['segments'] if entry['file'] not in merged_files
+                    ]
+                    manifest['segments'].append(new_entry)
+
+            if inputs_present:
+                self._delete_files(entries)
+                merged += 1
+            else:
+                # Another writer removed or merged some inputs meanwhile; discard the result
+                self._delete_files([new_entry])
+        return merged
+
+    def remove_orphan_files(self):
+        """Delete segment files no manifest entry refers to
+
+        A process that dies between writing a segment and committing the
+        manifest leaves such files behind. The grace period keeps files that
+        another writer is about to commit.
+        """
+        cutoff = time.time() - self.orphan_grace_seconds
+        with self._manifest_transaction() as manifest:
+            listed = {entry['file'] for entry in manifest['segments']}
+            orphans = []
+            for file_name in os.listdir(self.segments_dir):
+                if not file_name.endswith(('.npz', '.tmp')) or file_name in listed:
+                    continue
+                path = os.path.join(self.segments_dir, file_name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        orphans.append({'file': file_name})
+                except FileNotFoundError:
+                    pass
+
+        self._delete_files(orphans)
+        return len(orphans)
+
+    def _compaction_loop(self):
+        """Background compaction and retention"""
+        while not self._stop_event.wait(self.compact_interval):
+            try:
+                self.compact_segments()
+                self.enforce_retention()
+                self.remove_orphan_files()
+            except Exception as e:
+                print(f"Error compacting segments: {e}")
+
+    def start_compactor(self):
+        """Start background compaction thread"""
+        if self._compactor_thread and self._compactor_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._compactor_thread = threading.Thread(target=self._compaction_loop)
+        self._compactor_thread.daemon = True
+        self._compactor_thread.start()
+
+    def close(self):
+        """Stop background compaction"""
+        self._stop_event.set()
+        if self._compactor_thread:
+            self._compactor_thread.join()
+            self._compactor_thread = None
+
+    def get_storage_info(self):
+        """Summarize segment count, row count and disk usage"""
+        with self._lock:
+            self.manifest = self._load_manifest()
+            segments = list(self.manifest['segments'])
+        return {
+            'segments': len(segments),
+            'rows': sum(entry['rows'] for entry in segments),
+            'bytes': sum(entry['bytes'] for entry in segments),
+        }
+
     def get_emotion_statistics(self, df):
         """Calculate emotion statistics"""
         if df.empty:
             return {}
         
-        emotion_cols = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+        emotion_cols = EMOTION_COLUMNS
         stats = {}
         
         # Basic statistics
@@ -2,18 +2,22 @@ import cv2
 import numpy as np
 from deepface import DeepFace
 import pandas as pd
-import time
 from datetime import datetime
 import threading
 import queue
+from frame_scheduler import FrameScheduler
 
 class EmotionDetector:
-    def __init__(self):
+    def __init__(self, target_fps=10.0, cpu_budget=None, idle_fps=2.0, idle_after=5.0):
         self.cap = None
         self.is_running = False
         self.emotion_queue = queue.Queue()
         self.current_frame = None
         self.current_emotions = None
+        self.listeners = []
+        self.detection_thread = None
+        self.stop_event = threading.Event()
+        self.scheduler = FrameScheduler(target_fps, cpu_budget, idle_fps, idle_after)
         
         # Initialize face cascade for face detection
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
@@ -108,36 +112,66 @@ class EmotionDetector:
         if not self.initialize_camera():
             return False
             
+        self.scheduler.reset()
+        self.stop_event.clear()
         self.is_running = True
-        detection_thread = threading.Thread(target=self._detection_loop)
-        detection_thread.daemon = True
-        detection_thread.start()
+        self.detection_thread = threading.Thread(target=self._detection_loop)
+        self.detection_thread.daemon = True
+        self.detection_thread.start()
         return True
     
     def _detection_loop(self):
         """Main detection loop running in separate thread"""
-        while self.is_running and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
+        try:
+            while self.is_running and self.cap.isOpened():
+                self.scheduler.start_iteration()
+                
+                # Over the CPU budget: grab (without decoding) to keep the camera buffer fresh
+                if not self.scheduler.should_infer():
+                    if not self.cap.grab():
+                        break
+                    self.scheduler.end_stage('grab')
+                    self.scheduler.wait(self.stop_event)
+                    continue
+                
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.scheduler.end_stage('capture')
                 
-            # Detect emotions
-            emotions, processed_frame = self.detect_emotions(frame.copy())
+                # Detect emotions
+                emotions, processed_frame = self.detect_emotions(frame.copy())
+                self.scheduler.end_stage('inference')
+                self.scheduler.face_seen(emotions is not None)
             
-            # Update current data
-            self.current_frame = processed_frame
-            self.current_emotions = emotions
+                # Update current data
+                self.current_frame = processed_frame
+                self.current_emotions = emotions
             
-            # Add to queue with timestamp
-            if emotions:
-                emotion_data = {
-                    'timestamp': datetime.now(),
-                    'emotions': emotions,
-                    'dominant_emotion': max(emotions, key=emotions.get)
-                }
-                self.emotion_queue.put(emotion_data)
+                # Add to queue with timestamp
+                if emotions:
+                    emotion_data = {
+                        'timestamp': datetime.now(),
+                        'emotions': emotions,
+                        'dominant_emotion': max(emotions, key=emotions.get)
+                    }
+                    self.emotion_queue.put(emotion_data)
+                else:
+                    emotion_data = None
             
-            time.sleep(0.1)  # Control frame rate
+                # Notify listeners (e.g. the streaming server)
+                for listener in list(self.listeners):
+                    try:
+                        listener(emotion_data, processed_frame)
+                    except Exception as e:
+                        print(f"Error in emotion listener: {e}")
+                self.scheduler.end_stage('publish')
+            
+                # Sleep only for what is left of the frame budget
+                self.scheduler.wait(self.stop_event)
+        finally:
+            # Let callers see that the loop ended, e.g. after the camera disappears
+            self.is_running = False
     
     def get_current_frame(self):
         """Get current processed frame"""
@@ -157,8 +191,49 @@ class EmotionDetector:
                 break
         return data
     
-    def stop_detection(self):
+    def get_current_fps(self):
+        """Get measured capture rate"""
+        return self.scheduler.current_fps if self.is_running else 0.0
+    
+    def get_inference_fps(self):
+        """Get measured emotion analysis rate (below capture rate when over the CPU budget)"""
+        return self.scheduler.inference_fps if self.is_running else 0.0
+    
+    def get_target_fps(self):
+        """Get the rate currently aimed for (lower while idle)"""
+        return self.scheduler.get_target_fps()
+    
+    def set_target_fps(self, target_fps):
+        """Change the processing rate used while faces are visible"""
+        self.scheduler.set_target_fps(target_fps)
+    
+    def is_idle(self):
+        """Whether detection has slowed down because no face was seen"""
+        return self.scheduler.is_idle()
+    
+    def get_stage_timings(self):
+        """Get smoothed capture/grab/inference/publish durations in seconds"""
+        return self.scheduler.get_stage_timings()
+    
+    def add_listener(self, callback):
+        """Register callback(emotion_data, frame) called from the detection thread"""
+        self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a listener"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+    
+    def stop_detection(self, timeout=2.0):
         """Stop emotion detection"""
         self.is_running = False
+        self.stop_event.set()
+        # Give the current iteration a moment to finish so listeners stop firing
+        if self.detection_thread and self.detection_thread is not threading.current_thread():
+            self.detection_thread.join(timeout)
+            if self.detection_thread.is_alive():
+                # Probably blocked in cap.read(); releasing the camera unblocks it
+                print("Detection thread still running after stop; releasing camera anyway")
+        self.detection_thread = None
         if self.cap:
             self.cap.release()
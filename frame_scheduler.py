@@ -0,0 +1,139 @@
+import math
+import time
+import threading
+
+class FrameScheduler:
+    def __init__(self, target_fps=10.0, cpu_budget=None, idle_fps=2.0, idle_after=5.0, smoothing=0.2,
+                 clock=time.monotonic):
+        """
+        target_fps: capture/processing rate to aim for while faces are being seen
+        cpu_budget: optional fraction (0-1] of wall time inference may use; frames
+            that don't fit are still captured but skip inference
+        idle_fps: rate used once no face has been seen for idle_after seconds (None disables idle mode)
+        smoothing: weight of the newest sample in the moving averages
+        clock: monotonic time source in seconds (replaceable in tests)
+        """
+        if cpu_budget is not None and not 0 < cpu_budget <= 1:
+            raise ValueError("cpu_budget must be in (0, 1]")
+        if idle_fps is not None and idle_fps <= 0:
+            raise ValueError("idle_fps must be positive")
+        if idle_after < 0:
+            raise ValueError("idle_after must not be negative")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+
+        self.set_target_fps(target_fps)
+        self.cpu_budget = cpu_budget
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.stage_durations = {}
+        self.current_fps = 0.0
+        self.inference_fps = 0.0
+        self.last_face_time = self.clock()
+        self._iteration_start = None
+        self._stage_start = None
+        self._last_inference = None
+        self._frames_since_inference = 0
+        self._lock = threading.Lock()
+
+    def set_target_fps(self, target_fps):
+        """Change the rate used while faces are visible"""
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+        self.target_fps = target_fps
+
+    def reset(self):
+        """Forget previous measurements, e.g. when detection restarts"""
+        with self._lock:
+            self.stage_durations = {}
+        self.current_fps = 0.0
+        self.inference_fps = 0.0
+        self.last_face_time = self.clock()
+        self._iteration_start = None
+        self._last_inference = None
+        self._frames_since_inference = 0
+
+    def start_iteration(self):
+        """Mark the beginning of a loop iteration"""
+        now = self.clock()
+        if self._iteration_start is not None:
+            self.current_fps = self._smooth(self.current_fps, 1.0 / max(now - self._iteration_start, 1e-6))
+        self._iteration_start = now
+        self._stage_start = now
+
+    def end_stage(self, name):
+        """Record the time since the previous stage ended under `name`"""
+        now = self.clock()
+        with self._lock:
+            self.stage_durations[name] = self._smooth(self.stage_durations.get(name), now - self._stage_start)
+        self._stage_start = now
+
+    def should_infer(self):
+        """Whether this frame gets inference, or is only grabbed to keep the camera buffer fresh
+
+        Without a CPU budget every frame is analyzed. With one, the measured
+        inference time decides how many frames to skip between analyses so
+        inference stays within the budget while capture keeps the target rate.
+        """
+        with self._lock:
+            inference = self.stage_durations.get('inference')
+
+        run = True
+        if self.cpu_budget and inference:
+            period = 1.0 / self.get_target_fps()
+            # An inference frame occupies max(inference, period) of wall time;
+            # skipped frames fill the rest of inference / cpu_budget
+            # (the epsilon keeps float noise from rounding an exact fit up)
+            skip = max(0, math.ceil((inference / self.cpu_budget - max(inference, period)) / period - 1e-9))
+            run = self._frames_since_inference >= skip
+
+        if run:
+            now = self.clock()
+            if self._last_inference is not None:
+                self.inference_fps = self._smooth(self.inference_fps, 1.0 / max(now - self._last_inference, 1e-6))
+            self._last_inference = now
+            self._frames_since_inference = 0
+        else:
+            self._frames_since_inference += 1
+        return run
+
+    def face_seen(self, seen):
+        """Tell the scheduler whether the last frame contained a face"""
+        if seen:
+            self.last_face_time = self.clock()
+
+    def is_idle(self):
+        """Whether no face has been seen for a while"""
+        return self.idle_fps is not None and self.clock() - self.last_face_time >= self.idle_after
+
+    def get_target_fps(self):
+        """Rate currently being aimed for, taking idle mode into account"""
+        if self.is_idle():
+            return min(self.target_fps, self.idle_fps)
+        return self.target_fps
+
+    def wait(self, stop_event=None):
+        """Sleep for whatever is left of this iteration's time slot
+
+        Late iterations start the next one immediately instead of sleeping.
+        Passing stop_event lets a stop request cut the sleep short.
+        """
+        delay = 1.0 / self.get_target_fps() - (self.clock() - self._iteration_start)
+        if delay > 0:
+            if stop_event is not None:
+                stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def get_stage_timings(self):
+        """Smoothed duration of each stage in seconds"""
+        with self._lock:
+            return dict(self.stage_durations)
+
+    def _smooth(self, average, sample):
+        if not average:
+            return sample
+        return average + self.smoothing * (sample - average)
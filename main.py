@@ -15,10 +15,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_data_manager():
+    """One DataManager (and one background compactor) shared by all browser sessions"""
+    return DataManager()
+
 # Initialize session state
 if 'detector' not in st.session_state:
     st.session_state.detector = EmotionDetector()
-    st.session_state.data_manager = DataManager()
+    st.session_state.data_manager = get_data_manager()
     st.session_state.dashboard = Dashboard()
     st.session_state.is_detecting = False
     st.session_state.emotion_buffer = []
@@ -41,7 +46,7 @@ def main():
         
         if st.button("⏹️ Stop Detection", key="stop"):
             if st.session_state.is_detecting:
-                st.session_state.detector.stop_detection()
+                st.session_state.detector.stop_detection(timeout=0.5)
                 st.session_state.is_detecting = False
                 st.success("Detection stopped!")
         
@@ -49,6 +54,21 @@ def main():
         st.header("📊 Settings")
         auto_save = st.checkbox("Auto-save data", value=True)
         refresh_rate = st.slider("Refresh rate (seconds)", 0.5, 3.0, 1.0, 0.5)
+        retention_days = st.number_input("Keep data for (days, 0 = forever)", 0, 3650, 0)
+        max_storage_mb = st.number_input("Storage limit (MB, 0 = unlimited)", 0, 100000, 1024)
+        st.session_state.data_manager.set_retention(retention_days, max_storage_mb)
+        target_fps = st.slider("Target processing FPS", 1.0, 30.0, 10.0, 1.0)
+        st.session_state.detector.set_target_fps(target_fps)
+        
+        if st.session_state.is_detecting:
+            detector = st.session_state.detector
+            st.metric(
+                "Processing FPS",
+                f"{detector.get_current_fps():.1f}",
+                delta=f"target {detector.get_target_fps():.1f}" + (" (idle)" if detector.is_idle() else ""),
+                delta_color="off"
+            )
+            st.metric("Inference FPS", f"{detector.get_inference_fps():.1f}")
     
     # Main content
     col1, col2 = st.columns([1, 1])
@@ -107,10 +127,9 @@ def main():
                     )
     
     # Load and display analytics
-    df = st.session_state.data_manager.load_emotion_data()
-    if not df.empty:
-        # Limit to recent data for performance
-        recent_df = df.tail(500)
+    # Only read the newest segments needed for the recent window
+    recent_df = st.session_state.data_manager.load_emotion_data(limit=500)
+    if not recent_df.empty:
         stats = st.session_state.data_manager.get_emotion_statistics(recent_df)
         
         # Update charts
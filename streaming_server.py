@@ -0,0 +1,332 @@
+import asyncio
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import time
+from urllib.parse import urlsplit, parse_qs
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# Clients only send control frames, which are limited to 125 bytes anyway
+MAX_CLIENT_FRAME = 4096
+CLOSE_TOO_BIG = 1009
+
+class Message:
+    def __init__(self, event, payload):
+        self.event = event
+        self.payload = payload
+        self._sse = None
+        self._ws = None
+
+    def sse_bytes(self):
+        """Encode once as a Server-Sent Event, shared by all SSE clients"""
+        if self._sse is None:
+            self._sse = f"event: {self.event}\ndata: {json.dumps(self.payload, default=str)}\n\n".encode()
+        return self._sse
+
+    def ws_bytes(self):
+        """Encode once as a WebSocket text frame, shared by all WebSocket clients"""
+        if self._ws is None:
+            body = json.dumps({'event': self.event, 'data': self.payload}, default=str).encode()
+            self._ws = encode_ws_frame(body, opcode=0x1)
+        return self._ws
+
+def encode_ws_frame(body, opcode=0x1):
+    """Build an unmasked server-to-client WebSocket frame"""
+    length = len(body)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + body
+
+class Subscriber:
+    def __init__(self, buffer_size, want_frames):
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.want_frames = want_frames
+        self.dropped = 0
+
+    def offer(self, message):
+        """Queue a message, dropping the oldest one if the client is behind"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+class Broadcaster:
+    def __init__(self, buffer_size=64):
+        self.buffer_size = buffer_size
+        self.subscribers = set()
+        # Updated on the event loop, read by the detector thread
+        self.frame_subscribers = 0
+
+    def subscribe(self, want_frames=False):
+        subscriber = Subscriber(self.buffer_size, want_frames)
+        self.subscribers.add(subscriber)
+        if want_frames:
+            self.frame_subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            if subscriber.want_frames:
+                self.frame_subscribers -= 1
+
+    def wants_frames(self):
+        """Whether any connected client asked for frames (safe to call from any thread)"""
+        return self.frame_subscribers > 0
+
+    def publish(self, message):
+        """Fan out a message without waiting on any client (call on the event loop)"""
+        for subscriber in self.subscribers:
+            if message.event == 'frame' and not subscriber.want_frames:
+                continue
+            subscriber.offer(message)
+
+class StreamingServer:
+    def __init__(self, host="127.0.0.1", port=8765, buffer_size=64):
+        self.host = host
+        self.port = port
+        self.broadcaster = Broadcaster(buffer_size)
+        self.loop = None
+        self.server = None
+        self.client_tasks = set()
+
+    async def start(self):
+        """Start accepting SSE and WebSocket clients"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop accepting clients and disconnect the connected ones"""
+        if self.server:
+            self.server.close()
+            # wait_closed() waits for open connections (Python 3.12+), so end them first
+            tasks = list(self.client_tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    def publish_threadsafe(self, message):
+        """Hand a message to the event loop from another thread (e.g. the detector)"""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.broadcaster.publish, message)
+
+    async def _handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self.client_tasks.add(task)
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                await self._send_error(writer, "405 Method Not Allowed")
+                return
+
+            url = urlsplit(parts[1])
+            query = parse_qs(url.query)
+            want_frames = query.get("frames", ["0"])[0] in ("1", "true")
+
+            if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_websocket(reader, writer, headers, want_frames)
+            elif url.path == "/events":
+                await self._serve_sse(reader, writer, want_frames)
+            else:
+                await self._send_error(writer, "404 Not Found")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.client_tasks.discard(task)
+            writer.close()
+
+    async def _send_error(self, writer, status):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+
+    async def _serve_sse(self, reader, writer, want_frames):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"Access-Control-Allow-Origin: *\r\n\r\n"
+        )
+        await writer.drain()
+        await self._pump(reader, writer, want_frames, Message.sse_bytes, self._wait_for_eof(reader))
+
+    async def _serve_websocket(self, reader, writer, headers, want_frames):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._send_error(writer, "400 Bad Request")
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        await self._pump(reader, writer, want_frames, Message.ws_bytes, self._read_ws_frames(reader, writer))
+
+    async def _pump(self, reader, writer, want_frames, encode, watch_client):
+        """Copy messages from this client's buffer to its socket until it disconnects"""
+        subscriber = self.broadcaster.subscribe(want_frames)
+        pump_task = asyncio.current_task()
+        watcher = asyncio.ensure_future(watch_client)
+
+        def on_disconnect(_):
+            pump_task.cancel()
+
+        watcher.add_done_callback(on_disconnect)
+        try:
+            while True:
+                # Write everything that is already buffered, then drain once
+                batch = [await subscriber.queue.get()]
+                while not subscriber.queue.empty():
+                    batch.append(subscriber.queue.get_nowait())
+                writer.write(b"".join(encode(message) for message in batch))
+                await writer.drain()
+        except asyncio.CancelledError:
+            if not watcher.done():
+                raise
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+            watcher.remove_done_callback(on_disconnect)
+            watcher.cancel()
+
+    async def _wait_for_eof(self, reader):
+        """SSE clients never send anything; return once the socket closes"""
+        while await reader.read(1024):
+            pass
+
+    async def _read_ws_frames(self, reader, writer):
+        """Handle client control frames; return on close or disconnect"""
+        try:
+            while True:
+                first, second = await reader.readexactly(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if length > MAX_CLIENT_FRAME or (opcode & 0x8 and length > 125):
+                    writer.write(encode_ws_frame(struct.pack("!H", CLOSE_TOO_BIG), opcode=0x8))
+                    return
+                mask = await reader.readexactly(4) if second & 0x80 else None
+                body = await reader.readexactly(length)
+                if mask:
+                    key = int.from_bytes((mask * (length // 4 + 1))[:length], "big")
+                    body = (int.from_bytes(body, "big") ^ key).to_bytes(length, "big")
+
+                if opcode == 0x8:  # close
+                    writer.write(encode_ws_frame(body[:2], opcode=0x8))
+                    return
+                if opcode == 0x9:  # ping
+                    writer.write(encode_ws_frame(body, opcode=0xA))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+def emotion_message(emotion_data):
+    """Build the broadcast record for one detection"""
+    return Message('emotion', {
+        'timestamp': emotion_data['timestamp'].isoformat(),
+        'emotions': {emotion: float(value) for emotion, value in emotion_data['emotions'].items()},
+        'dominant_emotion': emotion_data['dominant_emotion'],
+    })
+
+async def run_server(args):
+    # Imported here so the broadcaster can be used and benchmarked without OpenCV/DeepFace
+    import cv2
+    from emotion_detector import EmotionDetector
+    from data_manager import DataManager
+
+    # Created first so invalid rate/budget arguments fail before the server starts
+    detector = EmotionDetector(target_fps=args.target_fps, cpu_budget=args.cpu_budget, idle_fps=args.idle_fps)
+
+    server = StreamingServer(args.host, args.port, args.buffer_size)
+    await server.start()
+
+    data_manager = DataManager(retention_days=args.retention_days, max_total_mb=args.max_storage_mb) if args.save else None
+    pending = []
+
+    def on_detection(emotion_data, frame):
+        # Runs on the detection thread
+        if emotion_data:
+            server.publish_threadsafe(emotion_message(emotion_data))
+            if data_manager:
+                # `pending` is only touched on the event loop; saving happens off both threads
+                server.loop.call_soon_threadsafe(pending.append, emotion_data)
+
+        if args.frames and frame is not None and server.broadcaster.wants_frames():
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+            if ok:
+                server.publish_threadsafe(Message('frame', {
+                    'timestamp': time.time(),
+                    'jpeg': base64.b64encode(jpeg.tobytes()).decode(),
+                }))
+
+    detector.add_listener(on_detection)
+    if not detector.start_detection():
+        print("Failed to start camera")
+        await server.stop()
+        return
+
+    print(f"Streaming on http://{args.host}:{server.port}/events (SSE) and ws://{args.host}:{server.port}/ws")
+    async def flush():
+        batch = pending[:]
+        pending.clear()
+        await asyncio.to_thread(data_manager.save_emotion_data, batch)
+
+    try:
+        while detector.is_running:
+            await asyncio.sleep(1)
+            if data_manager and len(pending) >= 10:
+                await flush()
+    finally:
+        await asyncio.to_thread(detector.stop_detection)
+        await server.stop()
+        if data_manager:
+            # Run appends the detection thread scheduled before it stopped
+            await asyncio.sleep(0)
+            await flush()
+            data_manager.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless emotion streaming server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--buffer-size", type=int, default=64, help="Messages buffered per client before dropping")
+    parser.add_argument("--frames", action="store_true", help="Also broadcast JPEG frames to clients that ask for them")
+    parser.add_argument("--jpeg-quality", type=int, default=70)
+    parser.add_argument("--target-fps", type=float, default=10.0, help="Detection rate while faces are visible")
+    parser.add_argument("--cpu-budget", type=float, default=None, help="Max fraction of time spent processing (0-1]")
+    parser.add_argument("--idle-fps", type=float, default=2.0, help="Detection rate after no face has been seen for a while")
+    parser.add_argument("--save", action="store_true", help="Also persist detections with DataManager")
+    parser.add_argument("--retention-days", type=float, default=None, help="Delete saved data older than this")
+    parser.add_argument("--max-storage-mb", type=float, default=1024, help="Delete the oldest saved data beyond this size (0 = unlimited)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+
+from data_manager import DataManager, EMOTION_COLUMNS
+
+def make_record(timestamp, dominant='happy'):
+    emotions = {emotion: 0.0 for emotion in EMOTION_COLUMNS}
+    emotions[dominant] = 0.75
+    emotions['neutral'] += 0.25
+    return {'timestamp': timestamp, 'emotions': emotions, 'dominant_emotion': dominant}
+
+def make_manager(data_dir, **kwargs):
+    kwargs.setdefault('background_compaction', False)
+    kwargs.setdefault('max_total_mb', None)
+    return DataManager(str(data_dir), **kwargs)
+
+@pytest.fixture
+def legacy_csv(tmp_path):
+    """An old-style emotions.csv with rows from well outside any retention window"""
+    start = datetime(2025, 5, 30, 22, 46)
+    rows = []
+    for i in range(30):
+        row = {'timestamp': start + timedelta(seconds=i)}
+        row.update({emotion: (i + j) / 100 for j, emotion in enumerate(EMOTION_COLUMNS)})
+        row['dominant_emotion'] = 'sad' if i % 3 else 'happy'
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    df.to_csv(tmp_path / "emotions.csv", index=False)
+    return df
+
+def test_legacy_import_round_trip(tmp_path, legacy_csv):
+    manager = make_manager(tmp_path)
+    df = manager.load_emotion_data()
+
+    assert len(df) == len(legacy_csv)
+    assert (df['timestamp'] == pd.to_datetime(legacy_csv['timestamp'])).all()
+    assert list(df['dominant_emotion']) == list(legacy_csv['dominant_emotion'])
+    for emotion in EMOTION_COLUMNS:
+        assert (df[emotion] - legacy_csv[emotion]).abs().max() < 1e-6
+
+    # A second instance must not import the rows again
+    assert make_manager(tmp_path).get_storage_info()['rows'] == len(legacy_csv)
+
+def test_legacy_rows_survive_age_retention(tmp_path, legacy_csv):
+    manager = make_manager(tmp_path, retention_days=1)
+    assert manager.get_storage_info()['rows'] == len(legacy_csv)
+    manager.enforce_retention()
+    assert len(manager.load_emotion_data()) == len(legacy_csv)
+
+def test_range_and_limit_reads(tmp_path):
+    manager = make_manager(tmp_path)
+    start = datetime(2026, 1, 1, 10, 0)
+    # Several segments across two hourly partitions
+    for batch in range(6):
+        manager.save_emotion_data([
+            make_record(start + timedelta(minutes=20 * batch, seconds=i)) for i in range(5)
+        ])
+
+    assert len(manager.load_emotion_data()) == 30
+
+    newest = manager.load_emotion_data(limit=7)
+    assert len(newest) == 7
+    assert newest['timestamp'].iloc[-1] == start + timedelta(minutes=100, seconds=4)
+    assert newest['timestamp'].is_monotonic_increasing
+
+    end = start + timedelta(minutes=40, seconds=2)
+    ranged = manager.load_emotion_data(end=end, limit=10)
+    assert len(ranged) == 10
+    assert ranged['timestamp'].max() == end
+
+    window = manager.load_emotion_data(start=start + timedelta(minutes=20), end=start + timedelta(minutes=60, seconds=4))
+    assert len(window) == 15
+
+    assert manager.load_emotion_data(start=start + timedelta(days=1)).empty
+
+def test_retention_by_age(tmp_path):
+    manager = make_manager(tmp_path, retention_days=5)
+    now = datetime.now()
+    manager.save_emotion_data([make_record(now - timedelta(days=10, seconds=i)) for i in range(4)])
+    manager.save_emotion_data([make_record(now - timedelta(seconds=i)) for i in range(3)])
+
+    assert manager.enforce_retention() == 1
+    df = manager.load_emotion_data()
+    assert len(df) == 3
+    assert df['timestamp'].min() > now - timedelta(days=1)
+
+def test_retention_by_size_drops_oldest(tmp_path):
+    manager = make_manager(tmp_path)
+    start = datetime(2026, 1, 1)
+    for day in range(4):
+        manager.save_emotion_data([make_record(start + timedelta(days=day, seconds=i)) for i in range(5)])
+
+    segment_bytes = max(entry['bytes'] for entry in manager.manifest['segments'])
+    manager.set_retention(max_total_mb=2.5 * segment_bytes / (1024 * 1024))
+    assert manager.enforce_retention() == 2
+
+    df = manager.load_emotion_data()
+    assert df['timestamp'].min() >= start + timedelta(days=2)
+    assert manager.get_storage_info()['bytes'] <= manager.max_total_bytes
+
+def test_compaction_keeps_rows(tmp_path):
+    manager = make_manager(tmp_path)
+    start = datetime(2026, 1, 1, 10, 0)
+    for batch in range(5):
+        manager.save_emotion_data([make_record(start + timedelta(minutes=batch, seconds=i)) for i in range(4)])
+    before = manager.load_emotion_data()
+
+    assert manager.get_storage_info()['segments'] == 5
+    assert manager.compact_segments() == 1
+
+    info = manager.get_storage_info()
+    assert info['segments'] == 1
+    assert info['rows'] == 20
+    pd.testing.assert_frame_equal(manager.load_emotion_data(), before)
+    assert sorted(f for f in os.listdir(manager.segments_dir) if f.endswith('.npz')) == \
+        [manager.manifest['segments'][0]['file']]
+
+def test_instances_sharing_directory_keep_all_rows(tmp_path):
+    first = make_manager(tmp_path)
+    second = make_manager(tmp_path)
+    now = datetime.now()
+    first.save_emotion_data([make_record(now)])
+    second.save_emotion_data([make_record(now + timedelta(seconds=1))])
+    first.save_emotion_data([make_record(now + timedelta(seconds=2))])
+
+    assert len(first.load_emotion_data()) == 3
+    assert len(second.load_emotion_data()) == 3
+
+def test_remove_orphan_files(tmp_path):
+    manager = make_manager(tmp_path, orphan_grace_seconds=60)
+    manager.save_emotion_data([make_record(datetime.now())])
+
+    old = os.path.join(manager.segments_dir, "20260101T00-dead.npz.tmp")
+    fresh = os.path.join(manager.segments_dir, "20260101T00-busy.npz")
+    for path in (old, fresh):
+        with open(path, 'wb') as f:
+            f.write(b"partial")
+    os.utime(old, (0, 0))
+
+    assert manager.remove_orphan_files() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+    assert len(manager.load_emotion_data()) == 1
@@ -0,0 +1,88 @@
+import pytest
+
+from frame_scheduler import FrameScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def simulate(scheduler, clock, inference, grab=0.001, frames=400):
+    """Run the detection loop's timing against a fake clock; return (inference fraction, frames/s)"""
+    busy = 0.0
+    start = clock()
+    for _ in range(frames):
+        scheduler.start_iteration()
+        if scheduler.should_infer():
+            clock.advance(inference)
+            scheduler.end_stage('inference')
+            busy += inference
+        else:
+            clock.advance(grab)
+            scheduler.end_stage('grab')
+        # Same arithmetic as wait(), without sleeping
+        clock.advance(max(0.0, 1.0 / scheduler.get_target_fps() - (clock() - scheduler._iteration_start)))
+    elapsed = clock() - start
+    return busy / elapsed, frames / elapsed
+
+@pytest.mark.parametrize("inference, target_fps, cpu_budget", [
+    (0.1, 20, 0.5),
+    (0.03, 20, 0.25),
+    (0.2, 10, 0.5),
+    (0.05, 10, 1.0),
+])
+def test_cpu_budget_is_used_but_not_exceeded(inference, target_fps, cpu_budget):
+    clock = FakeClock()
+    scheduler = FrameScheduler(target_fps=target_fps, cpu_budget=cpu_budget, idle_fps=None, clock=clock)
+
+    fraction, _ = simulate(scheduler, clock, inference)
+
+    # Skipping whole frames can't hit the budget exactly, but must not waste most of it;
+    # a fast model is limited by the target rate before the budget
+    achievable = min(cpu_budget, inference * target_fps)
+    assert fraction <= cpu_budget + 0.01
+    assert fraction >= achievable * 0.75
+
+def test_capture_keeps_target_rate_while_skipping_inference():
+    clock = FakeClock()
+    scheduler = FrameScheduler(target_fps=20, cpu_budget=0.25, idle_fps=None, clock=clock)
+
+    _, fps = simulate(scheduler, clock, inference=0.03)
+
+    assert fps == pytest.approx(20, rel=0.05)
+    # Inference runs as often as the budget allows, rounded to whole frames
+    assert 0.75 * 0.25 / 0.03 <= scheduler.inference_fps <= 0.25 / 0.03
+
+def test_idle_mode_lowers_target():
+    clock = FakeClock()
+    scheduler = FrameScheduler(target_fps=10, idle_fps=2, idle_after=5, clock=clock)
+    assert scheduler.get_target_fps() == 10
+    clock.advance(5)
+    assert scheduler.is_idle()
+    assert scheduler.get_target_fps() == 2
+    scheduler.face_seen(True)
+    assert scheduler.get_target_fps() == 10
+
+@pytest.mark.parametrize("kwargs", [
+    dict(target_fps=0),
+    dict(idle_fps=0),
+    dict(cpu_budget=0),
+    dict(cpu_budget=1.5),
+    dict(idle_after=-1),
+    dict(smoothing=0),
+    dict(smoothing=5),
+])
+def test_invalid_settings_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        FrameScheduler(**kwargs)
+
+def test_set_target_fps_rejects_non_positive():
+    scheduler = FrameScheduler()
+    with pytest.raises(ValueError):
+        scheduler.set_target_fps(0)
+    assert scheduler.target_fps == 10.0
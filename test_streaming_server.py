@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+
+from streaming_server import StreamingServer, Message, MAX_CLIENT_FRAME, CLOSE_TOO_BIG
+
+async def open_sse(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+async def open_ws(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        "GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+async def read_ws_frame(reader):
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    return first & 0x0F, await reader.readexactly(length)
+
+async def wait_for_subscribers(server, count):
+    while len(server.broadcaster.subscribers) < count:
+        await asyncio.sleep(0.01)
+
+async def wait_until_empty(server):
+    while server.broadcaster.subscribers:
+        await asyncio.sleep(0.01)
+
+def test_broadcast_reaches_sse_and_websocket_clients():
+    async def scenario():
+        server = StreamingServer(port=0)
+        await server.start()
+        sse_reader, sse_writer = await open_sse(server.port)
+        ws_reader, ws_writer = await open_ws(server.port)
+        await wait_for_subscribers(server, 2)
+
+        server.broadcaster.publish(Message('emotion', {'dominant_emotion': 'happy'}))
+
+        event = await asyncio.wait_for(sse_reader.readuntil(b"\n\n"), 2)
+        assert event.startswith(b"event: emotion\n")
+        assert json.loads(event.split(b"data: ", 1)[1]) == {'dominant_emotion': 'happy'}
+
+        opcode, body = await asyncio.wait_for(read_ws_frame(ws_reader), 2)
+        assert opcode == 0x1
+        assert json.loads(body) == {'event': 'emotion', 'data': {'dominant_emotion': 'happy'}}
+
+        sse_writer.close()
+        ws_writer.close()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+def test_stop_disconnects_connected_clients():
+    async def scenario():
+        server = StreamingServer(port=0)
+        await server.start()
+        sse_reader, _ = await open_sse(server.port)
+        ws_reader, _ = await open_ws(server.port)
+        await wait_for_subscribers(server, 2)
+
+        await asyncio.wait_for(server.stop(), 2)
+
+        assert not server.broadcaster.subscribers
+        assert await asyncio.wait_for(sse_reader.read(), 2) == b""
+        assert await asyncio.wait_for(ws_reader.read(), 2) == b""
+
+    asyncio.run(scenario())
+
+def test_oversized_client_frame_is_rejected():
+    async def scenario():
+        server = StreamingServer(port=0)
+        await server.start()
+        reader, writer = await open_ws(server.port)
+        await wait_for_subscribers(server, 1)
+
+        # Masked text frame header claiming a huge payload; no payload follows
+        writer.write(struct.pack("!BBQ", 0x81, 0x80 | 127, MAX_CLIENT_FRAME * 1024))
+        await writer.drain()
+
+        opcode, body = await asyncio.wait_for(read_ws_frame(reader), 2)
+        assert opcode == 0x8
+        assert struct.unpack("!H", body)[0] == CLOSE_TOO_BIG
+        await asyncio.wait_for(wait_until_empty(server), 2)
+
+        writer.close()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+def test_masked_ping_is_answered():
+    async def scenario():
+        server = StreamingServer(port=0)
+        await server.start()
+        reader, writer = await open_ws(server.port)
+        await wait_for_subscribers(server, 1)
+
+        payload = b"are you there?"
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        writer.write(struct.pack("!BB", 0x89, 0x80 | len(payload)) + mask + masked)
+        await writer.drain()
+
+        assert await asyncio.wait_for(read_ws_frame(reader), 2) == (0xA, payload)
+
+        writer.close()
+        await server.stop()
+
+    asyncio.run(scenario())